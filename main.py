@@ -12,16 +12,25 @@ import os
 import re
 import sys
 import argparse
-import requests
-import urllib.parse
+import asyncio
 import concurrent.futures
-from threading import Lock
-from bs4 import BeautifulSoup
+import io
+import httpx
+import hishel
+import aiofiles
+from aiolimiter import AsyncLimiter
+import urllib.parse
+from bs4 import BeautifulSoup, SoupStrainer
+from pypdf import PdfWriter
+from selectolax.lexbor import LexborHTMLParser
 from weasyprint import HTML, CSS
 import tempfile
 import shutil
 import logging
-import time
+from functools import lru_cache
+from hashlib import blake2b
+from pathlib import Path
+from html import unescape
 from urllib.parse import urljoin, urlparse
 
 # 设置日志
@@ -31,6 +40,177 @@ logging.basicConfig(
 )
 logger = logging.getLogger('gitbook2pdf')
 
+# 用于提取第一个<h1>标签文本的正则表达式
+_H1_RE = re.compile(r'<h1[^>]*>(.*?)</h1>', re.I | re.S)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+# 只解析可能包含正文的元素，跳过<head>中的脚本和样式
+_PAGE_STRAINER = SoupStrainer(['article', 'main', 'body', 'div'])
+
+# 小于该大小的图片一次性读入内存写盘，更大的文件按块流式写入
+_STREAM_THRESHOLD = 4 * 1024 * 1024
+_STREAM_CHUNK_SIZE = 1024 * 1024
+
+# 主要内容区域的CSS选择器，按优先级排列
+_CONTENT_SELECTORS = (
+    'article',
+    'main',
+    'div.content',
+    'div.article-content',
+    'div.markdown-section',
+    'div[role=main]',
+    'body'
+)
+
+# 目录元素的CSS选择器，按优先级排列
+_TOC_SELECTORS = ('nav', 'div.summary', 'ul.summary')
+
+_HEADING_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+
+# 导航和目录元素的CSS选择器
+_NAV_CSS = ', '.join(f'{tag}.{cls}' for tag in ('nav', 'div')
+                     for cls in ('summary', 'book-summary', 'table-of-contents'))
+
+# 需要从正文中移除的元素（导航、目录和页眉）的CSS选择器
+_BAD_CSS = ', '.join(f'{tag}.{cls}' for tag in ('nav', 'div') + _HEADING_TAGS
+                     for cls in ('summary', 'book-summary', 'table-of-contents', 'header', 'heading'))
+
+# HTML文档头部（包括页面样式）
+_HTML_HEAD = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>GitBook PDF</title>
+<style>
+body { font-family: Arial, sans-serif; line-height: 1.6; }
+h1 { page-break-before: always; }
+h1:first-of-type { page-break-before: avoid; }
+img { max-width: 100%; height: auto; }
+a { color: #4183C4; text-decoration: none; }
+pre { background-color: #f8f8f8; border: 1px solid #ddd; padding: 10px; overflow-x: auto; }
+code { background-color: #f8f8f8; padding: 2px 4px; }
+table { border-collapse: collapse; width: 100%; }
+table, th, td { border: 1px solid #ddd; padding: 8px; }
+</style>
+</head>
+<body>
+'''
+_HTML_TAIL = '</body>\n</html>'
+
+# PDF页面样式：页眉显示章节标题，页脚显示页码
+_PDF_CSS_TEXT = '''
+    @page {
+        margin: 1cm;
+        @top-center {
+            content: string(chapter);
+        }
+        @bottom-center {
+            content: counter(page);
+        }
+    }
+    h1 {
+        string-set: chapter content();
+        page-break-before: always;
+    }
+    h1:first-of-type {
+        page-break-before: avoid;
+    }
+'''
+
+# 生成HTML ID时需要移除的字符
+_ID_RE = re.compile(r'[^\w\s]')
+
+# 中文数字到阿拉伯数字的映射
+_CN_TABLE = str.maketrans({
+    '零': '0', '一': '1', '二': '2', '三': '3', '四': '4',
+    '五': '5', '六': '6', '七': '7', '八': '8', '九': '9',
+    '十': '10', '百': '100', '千': '1000', '万': '10000'
+})
+
+# 空白字符
+_WS_RE = re.compile(r'\s+')
+
+# 常见的标题前缀
+_PREFIX_RE = re.compile('第|章|chapter|section|part')
+
+
+@lru_cache(maxsize=4096)
+def _normalize_text(text):
+    """
+    标准化标题文本，用于相似度比较
+    
+    Args:
+        text (str): 原始文本
+        
+    Returns:
+        str: 标准化后的文本
+    """
+    # 移除所有空白字符并转为小写，再替换中文数字为阿拉伯数字
+    text = _WS_RE.sub('', text.lower()).translate(_CN_TABLE)
+    
+    # 移除常见的标题前缀（空白已全部移除，无需再strip）
+    return _PREFIX_RE.sub('', text)
+
+
+@lru_cache(maxsize=4096)
+def _make_id(text):
+    """
+    将文本转换为有效的HTML ID
+    
+    Args:
+        text (str): 原始文本
+        
+    Returns:
+        str: 有效的HTML ID
+    """
+    # 移除非字母数字字符，并将空格替换为下划线
+    return _ID_RE.sub('', text).replace(' ', '_').lower()
+
+
+@lru_cache(maxsize=8192)
+def _urljoin(base, url):
+    """带缓存的urljoin，基础URL固定且链接大量重复"""
+    return urljoin(base, url)
+
+
+@lru_cache(maxsize=8192)
+def _urlparse(url):
+    """带缓存的urlparse，返回值是不可变的命名元组，可以安全共享"""
+    return urlparse(url)
+
+
+def _similar_text(text1, text2):
+    """
+    检查两个文本是否相似（支持中文数字和阿拉伯数字的匹配）
+    
+    Args:
+        text1 (str): 第一个文本
+        text2 (str): 第二个文本
+        
+    Returns:
+        bool: 如果文本相似则返回True
+    """
+    try:
+        if not text1 or not text2:
+            return False
+        
+        # 转换为字符串（以防是其他类型）后标准化
+        norm_text1 = _normalize_text(str(text1))
+        norm_text2 = _normalize_text(str(text2))
+        
+        # 如果处理后的文本为空，返回False
+        if not norm_text1 or not norm_text2:
+            return False
+        
+        # 检查标准化后的文本是否相等
+        return norm_text1 == norm_text2
+        
+    except Exception as e:
+        logger.debug(f"文本相似度检查出错: {e}")
+        return False
+
+
 class GitbookScraper:
     """负责抓取GitBook网站内容的类"""
     
@@ -41,22 +221,28 @@ class GitbookScraper:
         Args:
             base_url (str): GitBook网站的基础URL
             output_dir (str, optional): 临时输出目录
-            delay (int, optional): 请求之间的延迟（秒）
+            delay (int, optional): 请求之间的延迟（秒），每个延迟周期内最多发起max_workers个请求
             proxy (dict, optional): 代理设置，格式为:
                 {
                     'http': 'http://proxy_ip:proxy_port',
                     'https': 'https://proxy_ip:proxy_port'
                 }
-            max_workers (int, optional): 最大线程数，默认为3
+            max_workers (int, optional): 最大并发请求数，默认为3
         """
         self.max_workers = max_workers
         self.base_url = base_url.rstrip('/')
         self.delay = delay
         self.proxy = proxy
-        self.session = requests.Session()
-        self.session.headers.update({
+        # httpx 的代理以URL前缀为键，如 'https://'
+        self.proxies = {f'{scheme}://': url for scheme, url in proxy.items()} if proxy else None
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        }
+        # 客户端、信号量和限速器需要在事件循环中创建，见scrape()
+        self.client = None
+        self.image_client = None
+        self.semaphore = None
+        self.limiter = None
         
         # 创建临时目录用于存储下载的内容
         if output_dir:
@@ -70,6 +256,8 @@ class GitbookScraper:
         
         # 存储已访问的URL，避免重复抓取
         self.visited_urls = set()
+        # 图片URL到下载任务的映射，多个页面引用同一图片时共享一次下载
+        self.image_tasks = {}
         # 存储页面内容和结构
         self.pages = []
         # 存储目录结构
@@ -78,7 +266,7 @@ class GitbookScraper:
         logger.info(f"初始化GitBook抓取器，基础URL: {self.base_url}")
         logger.info(f"输出目录: {self.output_dir}")
     
-    def get_page(self, url):
+    async def get_page(self, url):
         """
         获取页面内容
         
@@ -86,10 +274,10 @@ class GitbookScraper:
             url (str): 页面URL
             
         Returns:
-            BeautifulSoup: 解析后的页面内容
+            str: 页面的原始HTML
         """
         if not url.startswith('http'):
-            url = urljoin(self.base_url, url)
+            url = _urljoin(self.base_url, url)
             
         # 如果已经访问过，则跳过
         if url in self.visited_urls:
@@ -98,21 +286,19 @@ class GitbookScraper:
         logger.info(f"抓取页面: {url}")
         
         try:
-            response = self.session.get(url, proxies=self.proxy)
-            response.raise_for_status()
+            async with self.semaphore, self.limiter:
+                response = await self.client.get(url)
+                response.raise_for_status()
             self.visited_urls.add(url)
             
-            # 添加延迟，避免请求过于频繁
-            time.sleep(self.delay)
-            
-            return BeautifulSoup(response.text, 'html.parser')
-        except requests.exceptions.RequestException as e:
+            return response.text
+        except httpx.HTTPError as e:
             logger.error(f"抓取页面 {url} 时出错: {e}")
             return None
     
-    def download_image(self, img_url):
+    async def download_image(self, img_url):
         """
-        下载图片并保存到本地
+        下载图片并保存到本地，同一图片的并发请求共享一次下载
         
         Args:
             img_url (str): 图片URL
@@ -121,47 +307,101 @@ class GitbookScraper:
             str: 本地图片路径
         """
         if not img_url.startswith('http'):
-            img_url = urljoin(self.base_url, img_url)
-            
-        # 提取图片文件名
-        img_filename = os.path.basename(urlparse(img_url).path)
-        if not img_filename:
-            img_filename = f"img_{hash(img_url)}.png"
-            
-        local_path = os.path.join(self.img_dir, img_filename)
+            img_url = _urljoin(self.base_url, img_url)
         
-        # 如果图片已经下载，则跳过
-        if os.path.exists(local_path):
-            return local_path
-            
-        logger.info(f"下载图片: {img_url}")
+        # 事件循环是单线程的，查找和登记任务之间不会被打断
+        task = self.image_tasks.get(img_url)
+        if task is None:
+            task = asyncio.ensure_future(self._download_image(img_url))
+            self.image_tasks[img_url] = task
+        return await task
+    
+    async def _download_image(self, img_url):
+        """
+        实际下载图片的方法
         
+        Args:
+            img_url (str): 完整的图片URL
+            
+        Returns:
+            str: 本地图片路径，下载失败时为None
+        """
+        part_path = None
         try:
+            # 根据URL生成稳定的文件名，避免不同路径下的同名图片互相覆盖
+            ext = os.path.splitext(_urlparse(img_url).path)[1] or '.png'
+            img_filename = f"img_{blake2b(img_url.encode()).hexdigest()[:16]}{ext}"
+                
+            local_path = os.path.join(self.img_dir, img_filename)
+            
+            # 如果图片已经下载（包括之前的运行），则跳过
+            if os.path.exists(local_path):
+                return local_path
+                
+            logger.info(f"下载图片: {img_url}")
+            
             # 使用代理设置（如果配置了代理）
-            kwargs = {'stream': True}
             if self.proxy:
-                kwargs['proxies'] = self.proxy
                 logger.debug(f"使用代理下载图片: {self.proxy}")
             
-            response = self.session.get(img_url, **kwargs)
-            response.raise_for_status()
-            
-            with open(local_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            async with self.semaphore, self.limiter:
+                async with self.image_client.stream('GET', img_url) as response:
+                    response.raise_for_status()
                     
-            # 添加延迟，避免请求过于频繁
-            time.sleep(self.delay)
+                    # 先写入临时文件，完整下载后再改名，避免残缺文件被当作缓存
+                    part_path = local_path + '.part'
+                    content_length = response.headers.get('Content-Length', '')
+                    async with aiofiles.open(part_path, 'wb') as f:
+                        if content_length.isdigit() and int(content_length) <= _STREAM_THRESHOLD:
+                            await f.write(await response.aread())
+                        else:
+                            async for chunk in response.aiter_bytes(_STREAM_CHUNK_SIZE):
+                                await f.write(chunk)
+                    os.replace(part_path, local_path)
             
             return local_path
-        except requests.exceptions.ProxyError as e:
+        except httpx.ProxyError as e:
             logger.error(f"代理错误 - 下载图片 {img_url} 失败: {e}")
             return None
-        except requests.exceptions.RequestException as e:
+        except (httpx.HTTPError, httpx.InvalidURL, ValueError, OSError) as e:
+            # 单张图片失败（包括无效地址）只跳过该图片，不影响整个页面
             logger.error(f"下载图片 {img_url} 失败: {e}")
             return None
+        finally:
+            # 下载失败时删除残留的临时文件
+            if part_path and os.path.exists(part_path):
+                try:
+                    os.remove(part_path)
+                except OSError as e:
+                    logger.debug(f"删除临时文件 {part_path} 失败: {e}")
     
-    def process_page_content(self, soup, page_url, title=None):
+    def _collect_image_srcs(self, soup):
+        """
+        收集页面中所有图片标签及其地址
+        
+        Args:
+            soup (BeautifulSoup): 解析后的页面内容
+            
+        Returns:
+            list: (img标签, src) 元组列表
+        """
+        return [(img, img['src']) for img in soup.find_all('img') if img.get('src')]
+    
+    async def _fetch_many(self, urls):
+        """
+        并发下载多张图片，相同地址只下载一次
+        
+        Args:
+            urls (iterable): 图片URL
+            
+        Returns:
+            dict: 图片URL到本地路径的映射（下载失败时为None）
+        """
+        unique_urls = list(dict.fromkeys(urls))
+        local_paths = await asyncio.gather(*(self.download_image(url) for url in unique_urls))
+        return dict(zip(unique_urls, local_paths))
+    
+    async def process_page_content(self, soup, page_url, title=None):
         """
         处理页面内容，下载图片并更新链接
         
@@ -173,46 +413,14 @@ class GitbookScraper:
         Returns:
             str: 处理后的HTML内容
         """
-        # 处理图片
-        for img in soup.find_all('img'):
-            if img is None:
-                continue
-            src = img.get('src')
-            if src:
-                local_path = self.download_image(src)
-                if local_path:
-                    img['src'] = os.path.relpath(local_path, self.output_dir)
-        
-        # 处理内部链接
-        for a in soup.find_all('a'):
-            if a is None:
-                continue
-            href = a.get('href')
-            if href and not href.startswith(('http', '#', 'mailto:')):
-                a['href'] = urljoin(page_url, href)
-        
-        # 移除导航和目录元素
-        for nav in soup.find_all(['nav', 'div'], class_=['summary', 'book-summary', 'table-of-contents']):
-            nav.decompose()
-        
         if not soup:
             logger.warning("传入的soup对象为None")
             return "<p>无法处理页面内容</p>"
 
-        # 尝试提取主要内容区域
-        content_selectors = [
-            ('article', {}),
-            ('main', {}),
-            ('div', {'class': 'content'}),
-            ('div', {'class': 'article-content'}),
-            ('div', {'class': 'markdown-section'}),
-            ('div', {'role': 'main'}),
-            ('body', {})
-        ]
-
+        # 尝试提取主要内容区域（按优先级依次尝试）
         main_content = None
-        for tag, attrs in content_selectors:
-            main_content = soup.find(tag, attrs)
+        for selector in _CONTENT_SELECTORS:
+            main_content = soup.select_one(selector)
             if main_content:
                 break
 
@@ -220,28 +428,37 @@ class GitbookScraper:
             logger.warning(f"在页面 {page_url} 中未找到主要内容区域")
             return "<p>未找到页面内容</p>"
 
+        # 移除导航和目录元素
+        for nav in main_content.select(_NAV_CSS):
+            nav.decompose()
+        
+        # 处理图片（只处理正文区域，跳过导航和页脚），所有图片并发下载
+        images = self._collect_image_srcs(main_content)
+        local_paths = await self._fetch_many(src for _, src in images)
+        for img, src in images:
+            local_path = local_paths.get(src)
+            if local_path:
+                img['src'] = os.path.relpath(local_path, self.output_dir)
+        
+        # 处理内部链接
+        for a in main_content.find_all('a'):
+            if a is None:
+                continue
+            href = a.get('href')
+            if href and not href.startswith(('http', '#', 'mailto:')):
+                a['href'] = _urljoin(page_url, href)
+
         try:
-            # 移除不需要的元素
-            for element in main_content.find_all(['nav', 'div', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-                if not element:
-                    continue
-                
-                try:
-                    classes = element.get('class', [])
-                    if classes:
-                        class_str = ' '.join(classes)
-                        if any(c in class_str for c in ['summary', 'book-summary', 'table-of-contents', 'header', 'heading']):
-                            element.decompose()
-                            continue
-                except AttributeError:
-                    continue
+            # 移除不需要的元素（嵌套在已移除元素中的跳过）
+            for element in main_content.select(_BAD_CSS):
+                if not element.decomposed:
+                    element.decompose()
 
-                if element.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-                    try:
-                        if title and self._similar_text(element.get_text(strip=True), title):
-                            element.decompose()
-                    except AttributeError:
-                        continue
+            # 移除与页面标题重复的标题
+            if title:
+                for heading in main_content.find_all(_HEADING_TAGS):
+                    if not heading.decomposed and self._similar_text(heading.get_text(strip=True), title):
+                        heading.decompose()
 
             return str(main_content)
 
@@ -260,62 +477,19 @@ class GitbookScraper:
         Returns:
             bool: 如果文本相似则返回True
         """
-        try:
-            if not text1 or not text2:
-                return False
-                
-            # 转换为字符串（以防是其他类型）
-            text1 = str(text1)
-            text2 = str(text2)
-            
-            # 中文数字到阿拉伯数字的映射
-            cn_nums = {
-                '零': '0', '一': '1', '二': '2', '三': '3', '四': '4',
-                '五': '5', '六': '6', '七': '7', '八': '8', '九': '9',
-                '十': '10', '百': '100', '千': '1000', '万': '10000'
-            }
-            
-            def normalize_text(text):
-                # 移除所有空白字符并转为小写
-                text = ''.join(text.lower().split())
-                
-                # 替换中文数字为阿拉伯数字
-                for cn, ar in cn_nums.items():
-                    text = text.replace(cn, ar)
-                
-                # 移除常见的标题前缀
-                prefixes = ['第', '章', 'chapter', 'section', 'part']
-                for prefix in prefixes:
-                    text = text.replace(prefix, '')
-                
-                return text.strip()
-            
-            # 标准化两个文本
-            norm_text1 = normalize_text(text1)
-            norm_text2 = normalize_text(text2)
-            
-            # 如果处理后的文本为空，返回False
-            if not norm_text1 or not norm_text2:
-                return False
+        return _similar_text(text1, text2)
             
-            # 检查标准化后的文本是否相等
-            return norm_text1 == norm_text2
-            
-        except Exception as e:
-            logger.debug(f"文本相似度检查出错: {e}")
-            return False
-            
-    def extract_toc(self, soup):
+    def extract_toc(self, html):
         """
         从页面中提取目录结构
         
         Args:
-            soup (BeautifulSoup): 解析后的页面内容
+            html (str): 页面的原始HTML
             
         Returns:
             list: 目录结构
         """
-        if not soup:
+        if not html:
             logger.warning("提取目录时收到空的页面内容")
             return []
             
@@ -323,20 +497,24 @@ class GitbookScraper:
         seen_hrefs = set()  # 用于跟踪已经添加的链接
         
         try:
+            # 只读查询，使用比BeautifulSoup快得多的Lexbor解析器
+            tree = LexborHTMLParser(html)
+            
             # 尝试查找目录元素
-            nav = soup.find('nav') or soup.find('div', class_='summary') or soup.find('ul', class_='summary')
+            nav = None
+            for selector in _TOC_SELECTORS:
+                nav = tree.css_first(selector)
+                if nav:
+                    break
             
             if nav:
-                for a in nav.find_all('a'):
+                for a in nav.css('a[href]'):
                     try:
-                        if not a or not a.get('href'):
+                        href = a.attributes.get('href')
+                        if not href or href.startswith(('#', 'http', 'javascript:', 'mailto:')):
                             continue
                             
-                        href = a['href']
-                        if href.startswith(('#', 'http', 'javascript:', 'mailto:')):
-                            continue
-                            
-                        title = a.get_text(strip=True)
+                        title = a.text(strip=True)
                         if not title or href in seen_hrefs:
                             continue
                             
@@ -345,8 +523,8 @@ class GitbookScraper:
                         # 计算层级
                         level = 0
                         parent = a.parent
-                        while parent and parent.name != 'nav':
-                            if parent.name in ['li', 'ul']:
+                        while parent is not None and parent.tag != 'nav':
+                            if parent.tag in ('li', 'ul'):
                                 level += 1
                             parent = parent.parent
                         
@@ -368,52 +546,8 @@ class GitbookScraper:
             logger.error(f"提取目录时出错: {e}")
             return []
     
-    def extract_toc(self, soup):
-        """
-        从页面中提取目录结构
-        
-        Args:
-            soup (BeautifulSoup): 解析后的页面内容
-            
-        Returns:
-            list: 目录结构
-        """
-        toc = []
-        seen_hrefs = set()  # 用于跟踪已经添加的链接
-        
-        # 尝试查找目录元素
-        nav = soup.find('nav') or soup.find('div', class_='summary') or soup.find('ul', class_='summary')
-        
-        if nav:
-            for a in nav.find_all('a'):
-                if a.get('href') and not a['href'].startswith(('#', 'http')):
-                    title = a.get_text(strip=True)
-                    href = a['href']
-                    
-                    # 跳过空标题或已经添加的链接
-                    if not title or href in seen_hrefs:
-                        continue
-                    
-                    seen_hrefs.add(href)
-                    
-                    # 计算层级
-                    level = 0
-                    parent = a.parent
-                    while parent and parent.name != 'nav':
-                        if parent.name == 'li' or parent.name == 'ul':
-                            level += 1
-                        parent = parent.parent
-                    
-                    toc.append({
-                        'title': title,
-                        'href': href,
-                        'level': level
-                    })
-        
-        return toc
-    
-    def _download_page(self, item):
-        """线程安全的页面下载方法"""
+    async def _download_page(self, index, item):
+        """异步下载并处理单个页面，结果按目录顺序写入self.pages[index]"""
         try:
             if 'title' not in item or 'href' not in item:
                 logger.debug(f"跳过无效的目录项: {item}")
@@ -427,78 +561,97 @@ class GitbookScraper:
                 return
             
             # 构建完整URL并获取页面
-            page_url = urljoin(self.base_url, href)
+            page_url = _urljoin(self.base_url, href)
             logger.info(f"抓取页面: {title} ({page_url})")
             
-            page_soup = self.get_page(page_url)
-            if not page_soup:
+            page_html = await self.get_page(page_url)
+            if not page_html:
                 logger.warning(f"无法获取页面内容: {page_url}")
                 # 添加一个空内容页面，以保持目录结构完整
-                with self.pages_lock:
-                    self.pages.append({
-                        'title': title,
-                        'url': page_url,
-                        'content': f"<p>无法获取页面内容: {page_url}</p>",
-                        'level': item.get('level', 0)
-                    })
+                self.pages[index] = {
+                    'title': title,
+                    'url': page_url,
+                    'content': f"<p>无法获取页面内容: {page_url}</p>",
+                    'level': item.get('level', 0)
+                }
                 return
             
-            # 处理页面内容
+            # 处理页面内容（需要修改DOM，使用BeautifulSoup）
             try:
-                if page_soup:
-                    # 始终使用目录中的标题，不处理页面中的标题
-                    content = self.process_page_content(page_soup, page_url, None)
-                else:
-                    logger.warning(f"页面 {page_url} 的soup对象为None")
-                    content = f"<p>无法获取页面内容: {page_url}</p>"
+                page_soup = BeautifulSoup(page_html, 'lxml', parse_only=_PAGE_STRAINER)
+                # 始终使用目录中的标题，不处理页面中的标题
+                content = await self.process_page_content(page_soup, page_url, None)
             except Exception as e:
                 logger.error(f"处理页面 {os.path.basename(href)} 时出错: {e}")
                 content = f"<p>处理页面内容时出错: {e}</p>"
             
-            # 线程安全地添加到页面列表
-            with self.pages_lock:
-                self.pages.append({
-                    'title': title,  # 使用目录中的标题
-                    'url': page_url,
-                    'content': content,
-                    'level': item.get('level', 0)
-                })
-                
+            # 每个位置只由一个任务写入，无需加锁
+            self.pages[index] = {
+                'title': title,  # 使用目录中的标题
+                'url': page_url,
+                'content': content,
+                'level': item.get('level', 0)
+            }
+            
         except Exception as e:
             logger.error(f"处理页面 {item.get('href', '未知')} 时出错: {e}")
 
-    def scrape(self):
+    async def scrape(self):
         """
-        开始抓取GitBook网站（使用多线程）
+        开始抓取GitBook网站（使用asyncio并发）
         
         Returns:
             tuple: (pages, toc) 页面内容和目录结构
         """
         logger.info("开始抓取GitBook网站")
         
+        self.semaphore = asyncio.Semaphore(self.max_workers)
+        # 全局限速：每个延迟周期内最多max_workers个请求，请求之间不再逐个等待
+        if self.delay:
+            self.limiter = AsyncLimiter(self.max_workers, time_period=self.delay)
+        else:
+            self.limiter = AsyncLimiter(1000, time_period=1.0)
+        # 启用HTTP/2，同一站点的所有请求复用一个连接
+        # 使用持久化的HTTP缓存，遵循Cache-Control并通过ETag/Last-Modified重新验证，
+        # 重复运行时未变化的内容无需再次下载
+        storage = hishel.AsyncFileStorage(
+            base_path=Path(self.output_dir) / 'http_cache',
+            ttl=86400
+        )
+        client_options = {
+            'http2': True,
+            'headers': self.headers,
+            'proxies': self.proxies,
+            'follow_redirects': True,
+            'limits': httpx.Limits(
+                max_connections=self.max_workers,
+                max_keepalive_connections=self.max_workers
+            )
+        }
+        self.client = hishel.AsyncCacheClient(storage=storage, **client_options)
+        # 图片不经过HTTP缓存：缓存层会把响应整体读入内存，无法流式写盘，
+        # 而且按URL命名的本地图片文件本身就是图片缓存
+        self.image_client = httpx.AsyncClient(**client_options)
+        
         try:
             # 获取首页
-            soup = self.get_page(self.base_url)
-            if not soup:
+            home_html = await self.get_page(self.base_url)
+            if not home_html:
                 logger.error("无法获取首页内容")
                 return [], []
             
             # 提取目录结构
-            self.toc = self.extract_toc(soup)
-            
-            # 创建线程安全的列表和锁
-            self.pages = []
-            self.pages_lock = Lock()
+            self.toc = self.extract_toc(home_html)
             
             if not self.toc:
                 logger.warning("无法从首页提取目录结构，尝试使用其他方法")
                 # 如果无法从首页提取目录，尝试查找常见的目录页
                 for summary_path in ['SUMMARY.md', 'summary.html', 'toc.html']:
                     try:
-                        summary_url = urljoin(self.base_url, summary_path)
-                        summary_soup = self.get_page(summary_url)
-                        if summary_soup:
-                            self.toc = self.extract_toc(summary_soup)
+                        summary_url = _urljoin(self.base_url, summary_path)
+                        summary_html = await self.get_page(summary_url)
+                        if summary_html:
+                            self.toc = self.extract_toc(summary_html)
                             if self.toc:
                                 logger.info(f"从 {summary_path} 成功提取目录")
                                 break
@@ -509,11 +662,11 @@ class GitbookScraper:
             if not self.toc:
                 logger.warning("无法找到目录结构，将从首页链接构建")
                 try:
-                    for a in soup.find_all('a'):
-                        if a and a.get('href') and not a['href'].startswith(('#', 'http', 'mailto:', 'javascript:')):
-                            title = a.get_text(strip=True)
-                            href = a['href']
-                            if title and href:
+                    for a in LexborHTMLParser(home_html).css('a[href]'):
+                        href = a.attributes.get('href')
+                        if href and not href.startswith(('#', 'http', 'mailto:', 'javascript:')):
+                            title = a.text(strip=True)
+                            if title:
                                 self.toc.append({
                                     'title': title,
                                     'href': href,
@@ -547,10 +700,10 @@ class GitbookScraper:
                 seen_urls.add(href)
                 filtered_toc.append(item)
             
-            # 使用线程池下载页面
-            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                futures = [executor.submit(self._download_page, item) for item in filtered_toc]
-                concurrent.futures.wait(futures)
+            # 并发下载页面，并发数由信号量控制；每个页面写入其目录位置，无需再排序
+            self.pages = [None] * len(filtered_toc)
+            await asyncio.gather(*(self._download_page(i, item) for i, item in enumerate(filtered_toc)))
+            self.pages = [page for page in self.pages if page is not None]
             
             # 更新过滤后的目录
             self.toc = filtered_toc
@@ -558,25 +711,18 @@ class GitbookScraper:
             if not self.pages:
                 logger.warning("未能抓取到任何页面内容")
             else:
-                # 根据目录顺序对页面进行排序
-                logger.info("根据目录顺序对页面进行排序...")
-                
-                # 创建URL到目录索引的映射
-                url_to_index = {}
-                for i, item in enumerate(filtered_toc):
-                    url = urljoin(self.base_url, item['href'])
-                    url_to_index[url] = i
-                
-                # 根据URL在目录中的位置对页面进行排序
-                self.pages.sort(key=lambda page: url_to_index.get(page['url'], float('inf')))
-                
                 logger.info(f"抓取完成，共获取 {len(self.pages)} 个页面")
                 
             return self.pages, self.toc
             
         except Exception as e:
             logger.exception(f"抓取过程中发生错误: {e}")
-            return self.pages, self.toc  # 返回已抓取的内容
+            # 返回已抓取的内容
+            self.pages = [page for page in self.pages if page is not None]
+            return self.pages, self.toc
+        finally:
+            await self.client.aclose()
+            await self.image_client.aclose()
     
     def cleanup(self):
         """清理临时文件"""
@@ -585,10 +731,40 @@ class GitbookScraper:
             logger.info(f"已清理临时目录: {self.output_dir}")
 
 
+@lru_cache(maxsize=None)
+def _pdf_css():
+    """
+    获取PDF页面样式，样式表只在每个进程中解析一次
+    
+    Returns:
+        CSS: 解析后的样式表
+    """
+    return CSS(string=_PDF_CSS_TEXT)
+
+
+def _init_render_worker():
+    """渲染子进程的初始化函数，提前解析样式表"""
+    _pdf_css()
+
+
+def _render_chapter(job):
+    """
+    在子进程中将单个章节的HTML渲染为PDF
+
+    Args:
+        job (tuple): (HTML文本, 解析相对路径的基础目录)
+
+    Returns:
+        bytes: PDF文件内容
+    """
+    html_text, base_url = job
+    return HTML(string=html_text, base_url=base_url).write_pdf(stylesheets=[_pdf_css()])
+
+
 class PDFGenerator:
     """负责将抓取的内容转换为PDF的类"""
     
-    def __init__(self, pages, toc, output_dir):
+    def __init__(self, pages, toc, output_dir, max_workers=1, keep_html=False):
         """
         初始化PDF生成器
         
@@ -596,86 +772,126 @@ class PDFGenerator:
             pages (list): 页面内容列表
             toc (list): 目录结构
             output_dir (str): 输出目录
+            max_workers (int, optional): 并行渲染的进程数，默认为1，即整本书作为一个文档渲染；
+                大于1时各章节并行渲染后合并（页码按章节重新开始）
+            keep_html (bool, optional): 是否将生成的HTML保存到输出目录（用于调试）
         """
         self.pages = pages
         self.toc = toc
         self.output_dir = output_dir
+        self.max_workers = max_workers or 1
+        self.keep_html = keep_html
         
         logger.info("初始化PDF生成器")
     
+    def _append_toc(self, parts, with_links=True):
+        """
+        将目录添加到HTML片段列表
+        
+        Args:
+            parts (list): HTML片段列表
+            with_links (bool, optional): 是否生成指向章节锚点的链接
+        """
+        parts.append('<h1>目录</h1>\n<ul>\n')
+        for item in self.toc:
+            if with_links:
+                parts.append(f'{"  " * item["level"]}<li><a href="#{self._make_id(item["title"])}">{item["title"]}</a></li>\n')
+            else:
+                parts.append(f'{"  " * item["level"]}<li>{item["title"]}</li>\n')
+        parts.append('</ul>\n')
+    
+    def _append_page(self, parts, page, page_id):
+        """
+        将单个页面添加到HTML片段列表
+        
+        Args:
+            parts (list): HTML片段列表
+            page (dict): 页面内容
+            page_id (str): 页面锚点ID
+        """
+        # 创建页面锚点和标题的div容器
+        parts.append(f'<div class="chapter" id="{page_id}">\n')
+        
+        # 检查内容是否已包含标题
+        content_has_title = False
+        if page['content']:
+            # 查找第一个<h1>标签
+            match = _H1_RE.search(page['content'])
+            if match:
+                # 去掉内部标签并还原HTML实体，检查是否与目录标题相似
+                h1_text = unescape(_TAG_RE.sub('', match.group(1)))
+                if self._similar_text(h1_text, page['title']):
+                    content_has_title = True
+        
+        # 只有当内容中没有标题时才添加
+        if not content_has_title:
+            parts.append(f'<h1>{page["title"]}</h1>\n')
+        
+        # 写入内容
+        parts.append(page['content'])
+        parts.append('</div>\n')
+    
+    def _save_html(self, html_path, html_text):
+        """
+        将生成的HTML保存到磁盘，仅用于调试
+        
+        Args:
+            html_path (str): HTML文件路径
+            html_text (str): HTML文本
+        """
+        with open(html_path, 'w', encoding='utf-8') as f:
+            f.write(html_text)
+        logger.info(f"已保存HTML文档: {html_path}")
+    
     def generate_html(self):
         """
         生成完整的HTML文档
         
         Returns:
-            str: HTML文档路径
+            str: HTML文本
         """
-        html_path = os.path.join(self.output_dir, 'gitbook.html')
+        # 在内存中拼接所有片段
+        parts = [_HTML_HEAD]
         
-        # 创建HTML文档
-        with open(html_path, 'w', encoding='utf-8') as f:
-            f.write('<!DOCTYPE html>\n')
-            f.write('<html>\n<head>\n')
-            f.write('<meta charset="UTF-8">\n')
-            f.write('<meta name="viewport" content="width=device-width, initial-scale=1.0">\n')
-            f.write('<title>GitBook PDF</title>\n')
-            f.write('<style>\n')
-            f.write('body { font-family: Arial, sans-serif; line-height: 1.6; }\n')
-            f.write('h1 { page-break-before: always; }\n')
-            f.write('h1:first-of-type { page-break-before: avoid; }\n')
-            f.write('img { max-width: 100%; height: auto; }\n')
-            f.write('a { color: #4183C4; text-decoration: none; }\n')
-            f.write('pre { background-color: #f8f8f8; border: 1px solid #ddd; padding: 10px; overflow-x: auto; }\n')
-            f.write('code { background-color: #f8f8f8; padding: 2px 4px; }\n')
-            f.write('table { border-collapse: collapse; width: 100%; }\n')
-            f.write('table, th, td { border: 1px solid #ddd; padding: 8px; }\n')
-            f.write('</style>\n')
-            f.write('</head>\n<body>\n')
-            
-            # 添加目录
-            f.write('<h1>目录</h1>\n<ul>\n')
-            for item in self.toc:
-                indent = '  ' * item['level']
-                f.write(f'{indent}<li><a href="#{self._make_id(item["title"])}">{item["title"]}</a></li>\n')
-            f.write('</ul>\n')
-            
-            # 添加页面内容
-            for page in self.pages:
-                # 创建页面锚点和标题的div容器
-                f.write(f'<div class="chapter" id="{self._make_id(page["title"])}">\n')
-                
-                # 检查内容是否已包含标题
-                content_has_title = False
-                if page['content']:
-                    # 查找第一个<h1>标签
-                    h1_start = page['content'].find('<h1')
-                    if h1_start >= 0:
-                        h1_end = page['content'].find('</h1>', h1_start)
-                        if h1_end >= 0:
-                            content_title = page['content'][h1_start:h1_end+5]
-                            # 检查是否与目录标题相似
-                            soup = BeautifulSoup(content_title, 'html.parser')
-                            if soup.h1 and self._similar_text(soup.h1.get_text(), page['title']):
-                                content_has_title = True
-                
-                # 只有当内容中没有标题时才添加
-                if not content_has_title:
-                    f.write(f'<h1>{page["title"]}</h1>\n')
-                
-                # 写入内容
-                f.write(page['content'])
-                f.write('</div>\n')
-                
-                # 添加章节分隔线（最后一页除外）
-                if page != self.pages[-1]:
-                    f.write('\n<hr style="page-break-after: always;">\n')
-                
-            f.write('</body>\n</html>')
+        # 添加目录
+        self._append_toc(parts)
+        
+        # 添加页面内容
+        ids = [self._make_id(page['title']) for page in self.pages]
+        last_index = len(self.pages) - 1
+        for i, page in enumerate(self.pages):
+            self._append_page(parts, page, ids[i])
+            
+            # 添加章节分隔线（最后一页除外）
+            if i != last_index:
+                parts.append('\n<hr style="page-break-after: always;">\n')
+            
+        parts.append(_HTML_TAIL)
+        return ''.join(parts)
+    
+    def generate_chapter_html(self):
+        """
+        为目录和每个页面分别生成独立的HTML文档
+        
+        Returns:
+            list: HTML文本列表，第一个为目录
+        """
+        # 各章节分开渲染，目录中的锚点无法跨文件跳转，改用PDF书签导航
+        parts = [_HTML_HEAD]
+        self._append_toc(parts, with_links=False)
+        parts.append(_HTML_TAIL)
+        chapters = [''.join(parts)]
         
-        logger.info(f"已生成HTML文档: {html_path}")
-        return html_path
+        for page in self.pages:
+            parts = [_HTML_HEAD]
+            self._append_page(parts, page, self._make_id(page['title']))
+            parts.append(_HTML_TAIL)
+            chapters.append(''.join(parts))
+        
+        return chapters
     
-    def _make_id(self, text):
+    @staticmethod
+    def _make_id(text):
         """
         将文本转换为有效的HTML ID
         
@@ -685,8 +901,7 @@ class PDFGenerator:
         Returns:
             str: 有效的HTML ID
         """
-        # 移除非字母数字字符，并将空格替换为下划线
-        return re.sub(r'[^\w\s]', '', text).replace(' ', '_').lower()
+        return _make_id(text)
         
     def _similar_text(self, text1, text2):
         """
@@ -699,50 +914,68 @@ class PDFGenerator:
         Returns:
             bool: 如果文本相似则返回True
         """
-        try:
-            if not text1 or not text2:
-                return False
-                
-            # 转换为字符串（以防是其他类型）
-            text1 = str(text1)
-            text2 = str(text2)
-            
-            # 中文数字到阿拉伯数字的映射
-            cn_nums = {
-                '零': '0', '一': '1', '二': '2', '三': '3', '四': '4',
-                '五': '5', '六': '6', '七': '7', '八': '8', '九': '9',
-                '十': '10', '百': '100', '千': '1000', '万': '10000'
-            }
-            
-            def normalize_text(text):
-                # 移除所有空白字符并转为小写
-                text = ''.join(text.lower().split())
-                
-                # 替换中文数字为阿拉伯数字
-                for cn, ar in cn_nums.items():
-                    text = text.replace(cn, ar)
-                
-                # 移除常见的标题前缀
-                prefixes = ['第', '章', 'chapter', 'section', 'part']
-                for prefix in prefixes:
-                    text = text.replace(prefix, '')
-                
-                return text.strip()
-            
-            # 标准化两个文本
-            norm_text1 = normalize_text(text1)
-            norm_text2 = normalize_text(text2)
-            
-            # 如果处理后的文本为空，返回False
-            if not norm_text1 or not norm_text2:
-                return False
-            
-            # 检查标准化后的文本是否相等
-            return norm_text1 == norm_text2
-            
-        except Exception as e:
-            logger.debug(f"文本相似度检查出错: {e}")
-            return False
+        return _similar_text(text1, text2)
+    
+    def _render_single(self, output_path):
+        """
+        将整本书作为一个HTML文档渲染为PDF
+        
+        Args:
+            output_path (str): PDF输出路径
+        """
+        html_text = self.generate_html()
+        if self.keep_html:
+            self._save_html(os.path.join(self.output_dir, 'gitbook.html'), html_text)
+        
+        # 使用WeasyPrint直接从内存中的HTML生成PDF，图片等相对路径基于输出目录解析
+        logger.debug("正在加载HTML文档")
+        html = HTML(string=html_text, base_url=self.output_dir)
+        
+        logger.debug(f"正在生成PDF文件: {output_path}")
+        html.write_pdf(output_path, stylesheets=[_pdf_css()])
+    
+    def _render_chapters(self, output_path):
+        """
+        使用多进程并行渲染各章节，再合并为一个PDF并生成书签
+        
+        Args:
+            output_path (str): PDF输出路径
+        """
+        chapters = self.generate_chapter_html()
+        if self.keep_html:
+            chapter_dir = os.path.join(self.output_dir, 'chapters')
+            os.makedirs(chapter_dir, exist_ok=True)
+            for i, chapter in enumerate(chapters):
+                self._save_html(os.path.join(chapter_dir, f'chapter_{i:04d}.html'), chapter)
+        jobs = [(chapter, self.output_dir) for chapter in chapters]
+        
+        logger.info(f"使用 {self.max_workers} 个进程并行渲染 {len(jobs)} 个章节")
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers,
+                                                    initializer=_init_render_worker) as executor:
+            chapter_pdfs = list(executor.map(_render_chapter, jobs))
+        
+        # 按顺序合并各章节，并记录每个章节的起始页
+        logger.debug(f"正在合并 {len(chapter_pdfs)} 个章节PDF")
+        writer = PdfWriter()
+        start_pages = []
+        for pdf_bytes in chapter_pdfs:
+            start_pages.append(len(writer.pages))
+            writer.append(io.BytesIO(pdf_bytes), import_outline=False)
+        
+        # 根据目录层级生成书签
+        writer.add_outline_item('目录', start_pages[0])
+        stack = []  # (层级, 书签)
+        for page, start_page in zip(self.pages, start_pages[1:]):
+            level = page.get('level', 0)
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+            parent = stack[-1][1] if stack else None
+            outline_item = writer.add_outline_item(page['title'], start_page, parent=parent)
+            stack.append((level, outline_item))
+        
+        logger.debug(f"正在生成PDF文件: {output_path}")
+        with open(output_path, 'wb') as f:
+            writer.write(f)
     
     def generate_pdf(self, output_path):
         """
@@ -754,37 +987,13 @@ class PDFGenerator:
         Returns:
             str: PDF文件路径
         """
-        html_path = self.generate_html()
-        
         logger.info(f"开始生成PDF: {output_path}")
         
         try:
-            # 使用WeasyPrint生成PDF
-            logger.debug(f"正在加载HTML文件: {html_path}")
-            html = HTML(filename=html_path)
-            
-            logger.debug("正在创建CSS样式")
-            css = CSS(string='''
-                @page {
-                    margin: 1cm;
-                    @top-center {
-                        content: string(chapter);
-                    }
-                    @bottom-center {
-                        content: counter(page);
-                    }
-                }
-                h1 {
-                    string-set: chapter content();
-                    page-break-before: always;
-                }
-                h1:first-of-type {
-                    page-break-before: avoid;
-                }
-            ''')
-            
-            logger.debug(f"正在生成PDF文件: {output_path}")
-            html.write_pdf(output_path, stylesheets=[css])
+            if self.max_workers > 1 and len(self.pages) > 1:
+                self._render_chapters(output_path)
+            else:
+                self._render_single(output_path)
             
             if os.path.exists(output_path):
                 file_size = os.path.getsize(output_path)
@@ -805,11 +1014,12 @@ def main():
     parser = argparse.ArgumentParser(description='将GitBook网站转换为PDF')
     parser.add_argument('url', help='GitBook网站URL')
     parser.add_argument('-o', '--output', help='输出PDF文件路径', default='gitbook.pdf')
-    parser.add_argument('-d', '--delay', type=float, help='请求之间的延迟（秒）', default=1.0)
+    parser.add_argument('-d', '--delay', type=float, help='限速周期（秒），每个周期内最多发起workers个请求', default=1.0)
     parser.add_argument('-t', '--temp', help='临时文件目录', default=None)
-    parser.add_argument('-w', '--workers', type=int, default=3, help='并发下载线程数（默认：3）')
+    parser.add_argument('-w', '--workers', type=int, default=3, help='最大并发请求数（默认：3）')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='PDF渲染进程数（默认：1，整本书一次渲染；大于1时按章节并行渲染）')
     parser.add_argument('-v', '--verbose', action='store_true', help='显示详细日志')
-    parser.add_argument('-k', '--keep-temp', action='store_true', help='保留临时文件（用于调试）')
+    parser.add_argument('-k', '--keep-temp', action='store_true', help='保留临时文件并保存生成的HTML（用于调试）')
     parser.add_argument('-p', '--proxy', help='代理服务器设置，格式为 http://proxy_ip:proxy_port')
     
     args = parser.parse_args()
@@ -838,8 +1048,8 @@ def main():
         
         # 抓取GitBook网站
         logger.info(f"开始抓取GitBook网站: {args.url}")
-        scraper = GitbookScraper(args.url, temp_dir, args.delay, proxy)
-        pages, toc = scraper.scrape()
+        scraper = GitbookScraper(args.url, temp_dir, args.delay, proxy, args.workers)
+        pages, toc = asyncio.run(scraper.scrape())
         
         if not pages:
             logger.error("未能抓取到任何页面内容")
@@ -849,7 +1059,7 @@ def main():
         
         # 生成PDF
         logger.info(f"开始生成PDF: {args.output}")
-        pdf_generator = PDFGenerator(pages, toc, temp_dir)
+        pdf_generator = PDFGenerator(pages, toc, temp_dir, args.jobs, keep_html=args.keep_temp)
         output_path = os.path.abspath(args.output)
         pdf_path = pdf_generator.generate_pdf(output_path)
         
@@ -882,6 +1092,8 @@ def main():
                 logger.info(f"临时文件保留在: {temp_dir}")
                 if os.path.exists(os.path.join(temp_dir, 'gitbook.html')):
                     logger.info("您可以查看生成的HTML文件: " + os.path.join(temp_dir, 'gitbook.html'))
+                elif os.path.exists(os.path.join(temp_dir, 'chapters')):
+                    logger.info("您可以查看生成的章节HTML文件: " + os.path.join(temp_dir, 'chapters'))
 
 
 if __name__ == '__main__':